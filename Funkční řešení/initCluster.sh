@@ -1,13 +1,23 @@
 #!/bin/bash
 
-# Helper: wait for Mongo to be ready on given container
+WAIT_INTERVAL=${WAIT_INTERVAL:-0.5}  # seconds between readiness probes
+WAIT_TIMEOUT=${WAIT_TIMEOUT:-180}    # give up after this many seconds
+
+# Helper: wait for Mongo to be ready on given container (extra args are passed to mongosh, e.g. credentials)
+# Polls in short intervals, so the next step starts as soon as the node answers ping.
 wait_for_mongo() {
   local container=$1
+  shift
+  local start=$SECONDS
   echo "Waiting for $container MongoDB to be ready..."
-  until docker compose exec "$container" mongosh --eval "db.runCommand({ ping: 1 })" > /dev/null 2>&1; do
-    echo "$container MongoDB not ready yet, waiting 5s..."
-    sleep 5
+  until docker compose exec -T "$container" mongosh --quiet "$@" --eval "db.runCommand({ ping: 1 }).ok" > /dev/null 2>&1; do
+    if (( SECONDS - start >= WAIT_TIMEOUT )); then
+      echo "$container MongoDB not ready after ${WAIT_TIMEOUT}s, giving up"
+      exit 1
+    fi
+    sleep "$WAIT_INTERVAL"
   done
+  echo "$container MongoDB ready after $((SECONDS - start))s"
 }
 
 # === Step 1: Start all containers ===
@@ -46,19 +56,14 @@ docker compose exec shard03-a bash scripts/auth.js
 # === Step 5: Enable sharding and setup shard key ===
 echo "Enabling sharding on router..."
 
-echo "Waiting for router to be ready for authenticated connections..."
-until docker compose exec router01 mongosh -u "admin" -p "nosql_2025" --authenticationDatabase admin --eval "db.runCommand({ ping: 1 })" > /dev/null 2>&1; do
-  echo "router01 not ready yet (auth), waiting another 5s..."
-  sleep 5
-done
+wait_for_mongo router01 -u "admin" -p "nosql_2025" --authenticationDatabase admin
 
-docker compose exec router01 mongosh -u "admin" -p "nosql_2025" --authenticationDatabase admin -f scripts/enable-sharding.js
+# Bulk load: 2dsphere indexes and schema validation are applied by the importer after the data is loaded
+docker compose exec router01 mongosh -u "admin" -p "nosql_2025" --authenticationDatabase admin --eval "var BULK_LOAD = true" -f scripts/enable-sharding.js
 
 echo "MongoDB cluster initialized successfully."
 
-echo "Waiting a bit before starting importer..."
-sleep 5
-
+# The importer waits for the routers itself (exponential backoff with failover between router01/02)
 docker compose --profile importer run importer
 
 echo "Connecting to MongoDB shell on router01..."
@@ -1,11 +1,46 @@
 sh.enableSharding("OSM_DB")
 db = db.getSiblingDB("OSM_DB")
 
-// --- Tourist Attractions ---
-if (db.getCollectionNames().includes("tourist_attractions")) {
-  db.tourist_attractions.drop()
+// KEEP_DATA=true (mongosh --eval "var KEEP_DATA = true" -f ...) ponechá existující kolekce
+// a jen aktualizuje validátor - pro inkrementální sync importeru (IMPORT_MODE=sync)
+const keepData = typeof KEEP_DATA !== "undefined" && KEEP_DATA
+
+// BULK_LOAD=true (initCluster.sh) připraví kolekce pro hromadný import: existuje jen index shard key,
+// validace je vypnutá a sekundární indexy se jen zapíšou do OSM_DB.deferred_setup. Importer je
+// po nahrání dat postaví najednou, zapne validaci a zkontroluje ji hromadně (apply_deferred_setup).
+const bulkLoad = typeof BULK_LOAD !== "undefined" && BULK_LOAD && !keepData
+
+function setupCollection(name, options) {
+  if (db.getCollectionNames().includes(name)) {
+    if (keepData) {
+      db.runCommand({ collMod: name, validator: options.validator })
+      return
+    }
+    db[name].drop()
+  }
+  if (bulkLoad) {
+    db.createCollection(name, Object.assign({}, options, { validationLevel: "off" }))
+    db.deferred_setup.replaceOne(
+      { _id: name },
+      { _id: name, indexes: [], validationLevel: "strict" },
+      { upsert: true }
+    )
+    return
+  }
+  db.deferred_setup.deleteOne({ _id: name })
+  db.createCollection(name, options)
 }
-db.createCollection("tourist_attractions", {
+
+function secondaryIndex(name, key) {
+  if (bulkLoad) {
+    db.deferred_setup.updateOne({ _id: name }, { $push: { indexes: { key: key } } })
+    return
+  }
+  db[name].createIndex(key)
+}
+
+// --- Tourist Attractions ---
+setupCollection("tourist_attractions", {
   validator: {
     $jsonSchema: {
       bsonType: "object",
@@ -40,21 +75,19 @@ db.createCollection("tourist_attractions", {
           },
           additionalProperties: false
         },
-        geohash: { bsonType: "string" }
+        geohash: { bsonType: "string" },
+        content_hash: { bsonType: "string" }
       },
       additionalProperties: false
     }
   }
 })
 db.tourist_attractions.createIndex({ geohash: 1 })
-db.tourist_attractions.createIndex({ geometry: "2dsphere" })
+secondaryIndex("tourist_attractions", { geometry: "2dsphere" })
 sh.shardCollection("OSM_DB.tourist_attractions", { geohash: 1 })
 
 // --- Accommodations ---
-if (db.getCollectionNames().includes("accommodations")) {
-  db.accommodations.drop()
-}
-db.createCollection("accommodations", {
+setupCollection("accommodations", {
   validator: {
     $jsonSchema: {
       bsonType: "object",
@@ -79,21 +112,21 @@ db.createCollection("accommodations", {
           },
           additionalProperties: true
         },
-        geohash: { bsonType: "string" }
+        geohash: { bsonType: "string" },
+        content_hash: { bsonType: "string" },
+        // předpočítaní sousedé ze spatialJoin.py
+        nearby: { bsonType: "object" }
       },
       additionalProperties: false
     }
   }
 })
 db.accommodations.createIndex({ geohash: 1 })
-db.accommodations.createIndex({ geometry: "2dsphere" })
+secondaryIndex("accommodations", { geometry: "2dsphere" })
 sh.shardCollection("OSM_DB.accommodations", { geohash: 1})
 
 // --- Transportation ---
-if (db.getCollectionNames().includes("transportation")) {
-  db.transportation.drop()
-}
-db.createCollection("transportation", {
+setupCollection("transportation", {
   validator: {
     $jsonSchema: {
       bsonType: "object",
@@ -124,13 +157,14 @@ db.createCollection("transportation", {
           },
           additionalProperties: true
         },
-        geohash: { bsonType: "string" }
+        geohash: { bsonType: "string" },
+        content_hash: { bsonType: "string" }
       },
       additionalProperties: false
     }
   }
 })
 db.transportation.createIndex({ geohash: 1 })
-db.transportation.createIndex({ geometry: "2dsphere" })
+secondaryIndex("transportation", { geometry: "2dsphere" })
 sh.shardCollection("OSM_DB.transportation", { geohash: 1 })
 
@@ -1,7 +1,20 @@
-import json
+import os
+import multiprocessing
+from collections import deque, Counter
 import geohash2
+import numpy as np
+import shapely
 from shapely.geometry import shape, Point, LineString, Polygon, MultiPolygon, MultiLineString
 from shapely.errors import ShapelyError  # safer exception catching
+from geojsonStream import iter_features, detect_container, write_features, write_prefix_index, content_hash
+from geohashCover import GEOHASH_ALPHABET, GEOHASH_PRECISION
+
+CHUNK_SIZE = 2000  # počet feature v jedné dávce pro worker
+INDEX_PREFIX = 7  # délka prefixu geohashe v sidecar indexu (odpovídá MAX_PREFIX importeru)
+OUTPUT_FORMATS = {".ndjson": "ndjson", ".bson": "bson"}
+_BASE32 = np.array(list(GEOHASH_ALPHABET), dtype="U1")
+_BASE32_VALUES = np.zeros(128, dtype=np.uint8)
+_BASE32_VALUES[[ord(c) for c in GEOHASH_ALPHABET]] = np.arange(32)
 
 def compute_geohash(geometry):
     try:
@@ -13,115 +26,278 @@ def compute_geohash(geometry):
             geo_shape = shape(geometry)
             centroid: Point = geo_shape.centroid
             lon, lat = centroid.x, centroid.y
-        return geohash2.encode(lat, lon, precision=9)
+        return geohash2.encode(lat, lon, precision=GEOHASH_PRECISION)
     except Exception:
         return None
 
-def clean_osm_data_for_mongo(features):
-    seen_ids = set()
-    cleaned = []
-    removed_count = 0
-    invalid_geometry_count = 0
+def encode_geohashes(lats, lons, precision=GEOHASH_PRECISION):
+    # Vektorová obdoba geohash2.encode - stejné půlení intervalů ve float64 nad celým polem,
+    # takže výsledek je bitově shodný se skalární verzí
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    n = len(lats)
+    lat_lo, lat_hi = np.full(n, -90.0), np.full(n, 90.0)
+    lon_lo, lon_hi = np.full(n, -180.0), np.full(n, 180.0)
+    codes = np.zeros((n, precision), dtype=np.uint8)
+    for bit in range(precision * 5):
+        if bit % 2 == 0:
+            mid = (lon_lo + lon_hi) / 2
+            upper = lons > mid
+            lon_lo = np.where(upper, mid, lon_lo)
+            lon_hi = np.where(upper, lon_hi, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            upper = lats > mid
+            lat_lo = np.where(upper, mid, lat_lo)
+            lat_hi = np.where(upper, lat_hi, mid)
+        codes[:, bit // 5] |= upper.astype(np.uint8) << (4 - bit % 5)
+    return np.ascontiguousarray(_BASE32[codes]).view(f"U{precision}").ravel().tolist()
 
-    for feature in features:
-        osm_id = feature.get("id")
-        if osm_id is None:
-            removed_count += 1
-            continue
+def decode_geohashes(geohashes):
+    # Inverze encode_geohashes: středy buněk (lats, lons); chyba je nejvýš půl buňky,
+    # u přesnosti 9 jednotky metrů. Geohashe různé délky se dekódují po skupinách.
+    geohashes = list(geohashes)
+    lats, lons = np.zeros(len(geohashes)), np.zeros(len(geohashes))
+    by_length = {}
+    for i, geohash in enumerate(geohashes):
+        by_length.setdefault(len(geohash), []).append(i)
+    for precision, idx in by_length.items():
+        raw = np.frombuffer("".join(geohashes[i] for i in idx).encode("ascii"), dtype=np.uint8)
+        codes = _BASE32_VALUES[raw].reshape(len(idx), precision)
+        lat_lo, lat_hi = np.full(len(idx), -90.0), np.full(len(idx), 90.0)
+        lon_lo, lon_hi = np.full(len(idx), -180.0), np.full(len(idx), 180.0)
+        for bit in range(precision * 5):
+            upper = (codes[:, bit // 5] >> (4 - bit % 5)) & 1 == 1
+            if bit % 2 == 0:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo = np.where(upper, mid, lon_lo)
+                lon_hi = np.where(upper, lon_hi, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo = np.where(upper, mid, lat_lo)
+                lat_hi = np.where(upper, lat_hi, mid)
+        lats[idx] = (lat_lo + lat_hi) / 2
+        lons[idx] = (lon_lo + lon_hi) / 2
+    return lats, lons
 
-        geometry = feature.get("geometry", {})
-        geom_type = geometry.get("type")
-        coords = geometry.get("coordinates")
-
-        if coords is None:
-            removed_count += 1
-            continue
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
 
-        if geom_type == "LineString" and len(coords) < 2:
-            removed_count += 1
+def compute_geohashes(geometries, shapes=None):
+    # Dávková varianta compute_geohash: body přímo ze souřadnic, ostatní přes vektorový
+    # shapely.centroid; nestandardní případy jdou přes compute_geohash, aby výstup zůstal stejný
+    n = len(geometries)
+    lats, lons = np.zeros(n), np.zeros(n)
+    fallback = []
+    centroid_idx, centroid_shapes = [], []
+    for i, geometry in enumerate(geometries):
+        if geometry.get("type") == "Point":
+            coords = geometry.get("coordinates")
+            if isinstance(coords, list) and len(coords) == 2 and all(_is_number(c) for c in coords):
+                lons[i], lats[i] = coords
+            else:
+                fallback.append(i)
             continue
-        if geom_type == "Polygon" and not any(len(ring) >= 4 for ring in coords):
-            removed_count += 1
-            continue
-        if geom_type == "MultiPolygon" and not any(
-                any(len(ring) >= 4 for ring in polygon) for polygon in coords
-        ):
-            removed_count += 1
+        try:
+            geo_shape = shapes[i] if shapes is not None else shape(geometry)
+        except Exception:
+            fallback.append(i)
             continue
+        centroid_idx.append(i)
+        centroid_shapes.append(geo_shape)
+
+    if centroid_shapes:
+        centroids = shapely.centroid(np.array(centroid_shapes, dtype=object))
+        empty = shapely.is_empty(centroids)
+        xs, ys = np.full(len(centroids), np.nan), np.full(len(centroids), np.nan)
+        xs[~empty] = shapely.get_x(centroids[~empty])
+        ys[~empty] = shapely.get_y(centroids[~empty])
+        for i, x, y in zip(centroid_idx, xs, ys):
+            if np.isnan(x) or np.isnan(y):
+                fallback.append(i)
+            else:
+                lons[i], lats[i] = x, y
+
+    result = encode_geohashes(lats, lons)
+    for i in fallback:
+        result[i] = compute_geohash(geometries[i])
+    return result
+
+REMOVED, INVALID, OK = "removed", "invalid", "ok"
+
+def has_valid_structure(feature):
+    geometry = feature.get("geometry", {})
+    geom_type = geometry.get("type")
+    coords = geometry.get("coordinates")
+
+    if coords is None:
+        return False
+
+    if geom_type == "LineString" and len(coords) < 2:
+        return False
+    if geom_type == "Polygon" and not any(len(ring) >= 4 for ring in coords):
+        return False
+    if geom_type == "MultiPolygon" and not any(
+            any(len(ring) >= 4 for ring in polygon) for polygon in coords
+    ):
+        return False
+    return True
+
+def prune_properties(feature):
+    feature["_id"] = feature.pop("id")
+
+    props = feature.get("properties", {})
+    props.pop("@id", None)
+
+    for k in list(props.keys()):
+        if k.startswith("name:"):
+            props.pop(k)
+
+    if "@relations" in props:
+        for rel in props["@relations"]:
+            reltags = rel.get("reltags", {})
+            for k in list(reltags.keys()):
+                if k.startswith("name:"):
+                    reltags.pop(k)
 
-        # Additional geometry validity check using shapely
+def clean_feature_chunk(features):
+    # Kontroly a úpravy dávky feature nezávislé na ostatních (bez deduplikace podle _id), vrací
+    # [(stav, feature, geohash)]; is_valid, centroidy i geohashe pro celou dávku najednou
+    results = [None] * len(features)
+    idx, shapes = [], []
+    for i, feature in enumerate(features):
+        if feature.get("id") is None or not has_valid_structure(feature):
+            results[i] = (REMOVED, None, None)
+            continue
         try:
-            geo_shape = shape(geometry)
-            if not geo_shape.is_valid:
-                invalid_geometry_count += 1
-                continue
+            shapes.append(shape(feature["geometry"]))
+            idx.append(i)
         except ShapelyError:
-            invalid_geometry_count += 1
-            continue
+            results[i] = (INVALID, None, None)
 
-        if osm_id in seen_ids:
-            removed_count += 1
-            continue
-        seen_ids.add(osm_id)
+    if shapes:
+        valid = shapely.is_valid(np.array(shapes, dtype=object))
+        ok_idx, ok_shapes = [], []
+        for i, geo_shape, is_valid in zip(idx, shapes, valid):
+            if is_valid:
+                ok_idx.append(i)
+                ok_shapes.append(geo_shape)
+            else:
+                results[i] = (INVALID, None, None)
+        geohashes = compute_geohashes([features[i]["geometry"] for i in ok_idx], ok_shapes)
+        for i, geohash in zip(ok_idx, geohashes):
+            feature = features[i]
+            prune_properties(feature)
+            if geohash:
+                # geohash i otisk obsahu už ve workeru - rodič jen deduplikuje podle _id
+                feature["geohash"] = geohash  # <-- geohash is now top-level
+                feature["content_hash"] = content_hash(feature)
+            results[i] = (OK, feature, geohash)
+    return results
+
+def iter_chunks(features, size):
+    chunk = []
+    for feature in features:
+        chunk.append(feature)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-        feature["_id"] = osm_id
-        feature.pop("id", None)
+def iter_parallel_results(features, workers, chunk_size):
+    # Nejvýš 2 * workers rozpracovaných dávek, jinak by pool načetl celý vstup do paměti
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for chunk in iter_chunks(features, chunk_size):
+            pending.append(pool.apply_async(clean_feature_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
 
-        props = feature.get("properties", {})
-        props.pop("@id", None)
+def iter_clean_osm_data(features, stats, workers=1, chunk_size=CHUNK_SIZE):
+    # Při workers > 1 se feature posílají po dávkách do process poolu; výsledky se vrací
+    # ve vstupním pořadí a deduplikace _id proběhne tady, takže výstup je stejný jako sériově.
+    # stats se průběžně plní počty total / removed / invalid.
+    seen_ids = set()
+    if workers > 1:
+        results = iter_parallel_results(features, workers, chunk_size)
+    else:
+        results = (r for chunk in map(clean_feature_chunk, iter_chunks(features, chunk_size)) for r in chunk)
 
-        for k in list(props.keys()):
-            if k.startswith("name:"):
-                props.pop(k)
+    for status, feature, geohash in results:
+        stats["total"] += 1
+        if status == REMOVED:
+            stats["removed"] += 1
+            continue
+        if status == INVALID:
+            stats["invalid"] += 1
+            continue
 
-        if "@relations" in props:
-            for rel in props["@relations"]:
-                reltags = rel.get("reltags", {})
-                for k in list(reltags.keys()):
-                    if k.startswith("name:"):
-                        reltags.pop(k)
+        osm_id = feature["_id"]
+        if osm_id in seen_ids:
+            stats["removed"] += 1
+            continue
+        seen_ids.add(osm_id)
 
-        geohash = compute_geohash(geometry)
-        if geohash:
-            feature["geohash"] = geohash  # <-- geohash is now top-level
-        else:
-            removed_count += 1
+        if not geohash:
+            stats["removed"] += 1
             continue
 
-        cleaned.append(feature)
+        yield feature
 
-    print(f"Počet feature s nevalidní geometrií: {invalid_geometry_count}")
-    return cleaned, removed_count + invalid_geometry_count
+def new_stats():
+    return {"total": 0, "removed": 0, "invalid": 0}
 
-def main(input_file, output_file):
-    with open(input_file, encoding="utf-8") as f:
-        data = json.load(f)
+def clean_osm_data_for_mongo(features, workers=1, chunk_size=CHUNK_SIZE):
+    stats = new_stats()
+    cleaned = list(iter_clean_osm_data(features, stats, workers, chunk_size))
+    print(f"Počet feature s nevalidní geometrií: {stats['invalid']}")
+    return cleaned, stats["removed"] + stats["invalid"]
 
-    if isinstance(data, dict) and "features" in data:
-        features = data["features"]
-    elif isinstance(data, list):
-        features = data
-    else:
+def prefix_recorder(counts, sizes, plen):
+    # on_write pro write_features: počet a velikost zapsaných feature podle prefixu geohashe
+    def record(feature, size):
+        prefix = feature["geohash"][:plen]
+        counts[prefix] += 1
+        sizes[prefix] += size
+    return record
+
+def main(input_file, output_file, workers=1, fmt=None, index_prefix=INDEX_PREFIX):
+    # Vstup i výstup se zpracovávají po jedné feature - v paměti zůstává jen množina _id
+    container = detect_container(input_file)
+    if container not in ("FeatureCollection", "array", "ndjson", "bson"):
         print("Chyba: vstup není validní GeoJSON s polem 'features' nebo pole feature.")
         return
+    fmt = fmt or OUTPUT_FORMATS.get(os.path.splitext(output_file)[1], "json")
 
-    cleaned, removed_count = clean_osm_data_for_mongo(features)
-
-    output_data = {"type": "FeatureCollection", "features": cleaned} if isinstance(data, dict) else cleaned
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
+    stats = new_stats()
+    prefix_counts, prefix_bytes = Counter(), Counter()
+    cleaned = iter_clean_osm_data(iter_features(input_file), stats, workers)
+    record = prefix_recorder(prefix_counts, prefix_bytes, index_prefix) if fmt != "json" else None
+    written = write_features(output_file, cleaned, fmt, collection=(container == "FeatureCollection"),
+                             on_write=record)
+    if fmt != "json":
+        write_prefix_index(output_file, prefix_counts, index_prefix, prefix_bytes)
 
-    print(f"Počet původních feature: {len(features)}")
-    print(f"Počet odstraněných feature: {removed_count}")
-    print(f"Počet výsledných feature: {len(cleaned)}")
+    print(f"Počet feature s nevalidní geometrií: {stats['invalid']}")
+    print(f"Počet původních feature: {stats['total']}")
+    print(f"Počet odstraněných feature: {stats['removed'] + stats['invalid']}")
+    print(f"Počet výsledných feature: {written}")
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) != 3:
-        print("Použití: python dataCleaner.py vstup.geojson vystup.json")
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
-    main(input_file, output_file)
+    import argparse
+    parser = argparse.ArgumentParser(description="Vyčištění OSM GeoJSON dat pro import do MongoDB")
+    parser.add_argument("input_file", help="vstup.geojson (FeatureCollection, pole feature, .ndjson nebo .bson)")
+    parser.add_argument("output_file", help="vystup.json / vystup.ndjson / vystup.bson")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="počet procesů pro paralelní čištění (0 = počet jader)")
+    parser.add_argument("--format", choices=["json", "ndjson", "bson"], default=None,
+                        help="formát výstupu: kompaktní JSON, NDJSON nebo zřetězené BSON "
+                             "(výchozí podle přípony); u NDJSON a BSON vznikne i sidecar <vystup>.index")
+    parser.add_argument("--index-prefix", type=int, default=INDEX_PREFIX,
+                        help="délka prefixu geohashe v sidecar indexu")
+    args = parser.parse_args()
+    main(args.input_file, args.output_file, args.workers or multiprocessing.cpu_count(), args.format,
+         args.index_prefix)
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import struct
+
+READ_CHUNK = 1 << 20  # po kolika znacích se čte vstupní soubor
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+class _JsonReader:
+    # Inkrementální čtení JSONu - v paměti je vždy jen jeden blok souboru a právě parsovaná hodnota
+    def __init__(self, f, chunk_size=READ_CHUNK):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch):
+        found = self.peek()
+        if found != ch:
+            raise ValueError(f"Expected {ch!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # číslo nebo literál mohl být useknut na hranici bloku
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+    def items(self):
+        # '[' už je přečtena
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"Unexpected {ch!r} in JSON array")
+
+def detect_container(path, chunk_size=READ_CHUNK):
+    # "FeatureCollection", "array", "ndjson", "object" (JSON objekt bez pole features) nebo None
+    if path.endswith(".ndjson"):
+        return "ndjson"
+    if path.endswith(".bson"):
+        return "bson"
+    with open(path, encoding="utf-8") as f:
+        reader = _JsonReader(f, chunk_size)
+        first = reader.peek()
+        if first == "[":
+            return "array"
+        if first != "{":
+            return None
+        reader.pos += 1
+        if reader.peek() == "}":
+            return "object"
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == "features" and reader.peek() == "[":
+                return "FeatureCollection"
+            reader.value()
+            ch = reader.peek()
+            reader.pos += 1
+            if ch != ",":
+                return "object"
+
+def iter_ndjson(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_raw_bson(path):
+    # Soubor je zřetězení BSON dokumentů (jako u mongodump), každý začíná svou délkou
+    with open(path, "rb") as f:
+        while True:
+            head = f.read(4)
+            if not head:
+                return
+            if len(head) < 4:
+                raise ValueError(f"Truncated BSON document in {path}")
+            size = struct.unpack("<i", head)[0]
+            body = f.read(size - 4)
+            if len(body) < size - 4:
+                raise ValueError(f"Truncated BSON document in {path}")
+            yield head + body
+
+def iter_features(path, chunk_size=READ_CHUNK, keys=("features",)):
+    # Prvky z FeatureCollection, z holého pole, z NDJSON nebo z BSON, bez načtení celého souboru.
+    # keys = klíče objektu s polem prvků (Overpass výstup má "elements").
+    # Objekt bez takového klíče se vrátí celý jako jediný dokument.
+    if path.endswith(".ndjson"):
+        yield from iter_ndjson(path)
+        return
+    if path.endswith(".bson"):
+        from bson import decode
+        for raw in iter_raw_bson(path):
+            yield decode(raw)
+        return
+    with open(path, encoding="utf-8") as f:
+        reader = _JsonReader(f, chunk_size)
+        first = reader.peek()
+        if first == "[":
+            reader.pos += 1
+            yield from reader.items()
+            return
+        if first != "{":
+            raise ValueError(f"Unexpected {first!r} at start of {path}")
+
+        reader.pos += 1
+        rest = {}
+        has_features = False
+        if reader.peek() == "}":
+            reader.pos += 1
+        else:
+            while True:
+                key = reader.value()
+                reader.expect(":")
+                if key in keys and reader.peek() == "[":
+                    reader.pos += 1
+                    has_features = True
+                    yield from reader.items()
+                else:
+                    rest[key] = reader.value()
+                ch = reader.peek()
+                reader.pos += 1
+                if ch == "}":
+                    break
+                if ch != ",":
+                    raise ValueError(f"Unexpected {ch!r} in JSON object")
+        if not has_features and rest:
+            yield rest
+
+def write_features(path, features, fmt="json", collection=False, on_write=None):
+    # json = kompaktní JSON (FeatureCollection nebo pole), ndjson = jedna feature na řádek,
+    # bson = zřetězené BSON dokumenty pro import bez dalšího parsování;
+    # zapisuje se průběžně, vrací počet zapsaných feature.
+    # on_write(feature, size) dostane velikost zapsaného záznamu (BSON bajty, u JSONu znaky)
+    count = 0
+    if fmt == "bson":
+        from bson import encode
+        with open(path, "wb") as f:
+            for feature in features:
+                data = encode(feature)
+                f.write(data)
+                count += 1
+                if on_write:
+                    on_write(feature, len(data))
+        return count
+
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "ndjson":
+            for feature in features:
+                line = json.dumps(feature, ensure_ascii=False, separators=(",", ":"))
+                f.write(line)
+                f.write("\n")
+                count += 1
+                if on_write:
+                    on_write(feature, len(line))
+            return count
+
+        f.write('{"type":"FeatureCollection","features":[\n' if collection else "[\n")
+        for feature in features:
+            if count:
+                f.write(",\n")
+            line = json.dumps(feature, ensure_ascii=False, separators=(",", ":"))
+            f.write(line)
+            count += 1
+            if on_write:
+                on_write(feature, len(line))
+        f.write("\n]}\n" if collection else "\n]\n")
+    return count
+
+def content_hash(feature):
+    # Otisk obsahu feature bez _id - podle něj importer při syncu pozná změněné dokumenty
+    body = {k: v for k, v in feature.items() if k not in ("_id", "content_hash")}
+    data = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+def index_path(path):
+    return path + ".index"
+
+def write_prefix_index(path, prefix_counts, prefix_length, prefix_bytes=None):
+    # Sidecar s histogramem prefixů geohashe - importer pak nemusí data před importem číst;
+    # prefix_bytes = součet velikostí záznamů pod prefixem (váhy pro plánování zón)
+    index = {
+        "prefix_length": prefix_length,
+        "count": sum(prefix_counts.values()),
+        "prefix_counts": dict(sorted(prefix_counts.items())),
+    }
+    if prefix_bytes is not None:
+        index["prefix_bytes"] = dict(sorted(prefix_bytes.items()))
+    with open(index_path(path), "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+
+def read_prefix_index(path):
+    ipath = index_path(path)
+    if not os.path.isfile(ipath) or os.path.getmtime(ipath) < os.path.getmtime(path):
+        return None
+    with open(ipath, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import numpy as np
+import dataImport
+from dataCleaner import encode_geohashes, prefix_recorder, INDEX_PREFIX
+from geojsonStream import write_features, write_prefix_index, content_hash
+from mongoConnection import connect_mongo
+
+# Reprodukovatelný benchmark importu: syntetické OSM-like feature (body a malé polygony se
+# stejnou strukturou jako výstup dataCleaneru) se zvolenou velikostí a prostorovou nerovnoměrností,
+# import stejných dat několika strategiemi a JSON report s metrikami z dataImport.
+#
+#   python importBenchmark.py --docs 200000 --skew 1.2 --strategies thread:4,process:4,async:8
+#
+# Proti lokálnímu mongod (single node) nebo mongos; na shardovaném clusteru se kolekce před každým
+# během nashardují podle {geohash: 1}, s --zones se navíc naplánují zóny jako při běžném importu.
+
+CZ_BOUNDS = (12.09, 48.55, 18.87, 51.06)  # lon_min, lat_min, lon_max, lat_max
+TOURISM = ["hotel", "guest_house", "hostel", "camp_site", "museum", "attraction", "viewpoint", "artwork"]
+EXTRA_KEYS = ["wheelchair", "website", "opening_hours", "phone", "operator", "addr:city", "addr:street",
+              "addr:housenumber", "stars", "internet_access", "fee", "check_date"]
+
+def hotspot_centers(rng, count):
+    lon_min, lat_min, lon_max, lat_max = CZ_BOUNDS
+    return [(rng.uniform(lon_min, lon_max), rng.uniform(lat_min, lat_max)) for _ in range(count)]
+
+def sample_locations(rng, docs, skew, hotspots, spread):
+    # skew = 0: rovnoměrně po celé ČR; skew > 0: body kolem hotspotů s váhami 1 / rank^skew (Zipf),
+    # vyšší skew = víc dat v několika málo prefixech geohashe
+    lon_min, lat_min, lon_max, lat_max = CZ_BOUNDS
+    if skew <= 0:
+        return rng.uniform(lon_min, lon_max, docs), rng.uniform(lat_min, lat_max, docs)
+    centers = np.array(hotspot_centers(random.Random(int(rng.integers(1 << 31))), hotspots))
+    weights = 1.0 / np.arange(1, hotspots + 1) ** skew
+    picks = rng.choice(hotspots, size=docs, p=weights / weights.sum())
+    lons = np.clip(centers[picks, 0] + rng.normal(0, spread, docs), lon_min, lon_max)
+    lats = np.clip(centers[picks, 1] + rng.normal(0, spread, docs), lat_min, lat_max)
+    return lons, lats
+
+def synthetic_features(docs, skew=1.0, hotspots=20, spread=0.05, polygon_ratio=0.3, extra_tags=4, seed=42):
+    rng = np.random.default_rng(seed)
+    lons, lats = sample_locations(rng, docs, skew, hotspots, spread)
+    geohashes = encode_geohashes(lats, lons)
+    polygons = rng.random(docs) < polygon_ratio
+    tag_counts = rng.poisson(extra_tags, docs)
+    for i in range(docs):
+        lon, lat = round(float(lons[i]), 7), round(float(lats[i]), 7)
+        if polygons[i]:
+            d = 0.0005
+            ring = [[lon - d, lat - d], [lon + d, lat - d], [lon + d, lat + d], [lon - d, lat + d], [lon - d, lat - d]]
+            geometry, osm_type = {"type": "Polygon", "coordinates": [ring]}, "way"
+        else:
+            geometry, osm_type = {"type": "Point", "coordinates": [lon, lat]}, "node"
+        properties = {"name": f"Synthetic {i}", "tourism": TOURISM[i % len(TOURISM)]}
+        for key in EXTRA_KEYS[:min(int(tag_counts[i]), len(EXTRA_KEYS))]:
+            properties[key] = f"{key}-{i % 97}"
+        feature = {
+            "type": "Feature",
+            "properties": properties,
+            "geometry": geometry,
+            "_id": f"{osm_type}/{i}",
+            "geohash": geohashes[i],
+        }
+        feature["content_hash"] = content_hash(feature)
+        yield feature
+
+def generate_dataset(path, fmt, **params):
+    prefix_counts, prefix_bytes = Counter(), Counter()
+    t0 = time.perf_counter()
+    written = write_features(path, synthetic_features(**params), fmt,
+                             on_write=prefix_recorder(prefix_counts, prefix_bytes, INDEX_PREFIX))
+    if fmt != "json":
+        write_prefix_index(path, prefix_counts, INDEX_PREFIX, prefix_bytes)
+    return {
+        "path": path,
+        "format": fmt,
+        "docs": written,
+        "mb": round(os.path.getsize(path) / 1e6, 3),
+        "distinct_prefixes": len(prefix_counts),
+        "top_prefix_share": round(max(prefix_counts.values()) / written, 4) if written else 0,
+        "generate_s": round(time.perf_counter() - t0, 3),
+        **params,
+    }
+
+def parse_strategies(spec):
+    # "thread:4,process:4,async:8" -> [("thread", 4), ...]
+    strategies = []
+    for item in spec.split(","):
+        pool, _, workers = item.strip().partition(":")
+        if pool not in ("thread", "process", "async"):
+            raise ValueError(f"Unknown import pool '{pool}'")
+        strategies.append((pool, int(workers or dataImport.IMPORT_WORKERS)))
+    return strategies
+
+def is_sharded(client):
+    return client.admin.command("hello").get("msg") == "isdbgrid"
+
+def prepare_collection(client, cname, fpath, sharded, zones):
+    # Před každým během prázdná kolekce, aby strategie začínaly ze stejného stavu
+    db = client["OSM_DB"]
+    db[cname].drop()
+    if not sharded:
+        return
+    admin = client["admin"]
+    try:
+        admin.command({"enableSharding": "OSM_DB"})
+    except Exception as e:
+        if "already" not in str(e):
+            raise
+    admin.command({"shardCollection": f"OSM_DB.{cname}", "key": {"geohash": 1}})
+    if zones:
+        counts, sizes = dataImport.local_prefix_stats(fpath)
+        dataImport.apply_zone_plan(admin, db, {cname: dataImport.prefix_count_source(counts, sizes)},
+                                   dataImport.get_shards(admin))
+
+def run_benchmark(args):
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="import_bench_")
+    os.makedirs(data_dir, exist_ok=True)
+    fpath = os.path.join(data_dir, f"{args.collection}.{args.format}")
+    dataset = generate_dataset(fpath, args.format, docs=args.docs, skew=args.skew, hotspots=args.hotspots,
+                               spread=args.spread, polygon_ratio=args.polygon_ratio,
+                               extra_tags=args.extra_tags, seed=args.seed)
+    print(f"Generated {dataset['docs']} features ({dataset['mb']} MB, {dataset['distinct_prefixes']} "
+          f"prefixes, top prefix {dataset['top_prefix_share']:.1%}) in {dataset['generate_s']}s")
+
+    uris = args.uri.split(",")
+    client = connect_mongo(uris)
+    runs = []
+    with client:
+        sharded = is_sharded(client)
+        for pool, workers in parse_strategies(args.strategies):
+            for repeat in range(1, args.repeat + 1):
+                t0 = time.perf_counter()
+                prepare_collection(client, args.collection, fpath, sharded, args.zones)
+                setup = time.perf_counter() - t0
+                record = dataImport.import_json_file(args.collection, fpath, uris, workers, pool,
+                                                     args.queue_size or 2 * workers, args.batch_docs)
+                runs.append({"strategy": f"{pool}:{workers}", "repeat": repeat,
+                             "setup_s": round(setup, 3), **record})
+        if not args.keep_collection:
+            client["OSM_DB"][args.collection].drop()
+
+    report = {
+        "dataset": dataset,
+        "target": {"routers": len(uris), "sharded": sharded, "zones": args.zones},
+        "batch_docs": args.batch_docs,
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    print(f"{'strategy':<12} {'run':>3} {'docs/s':>10} {'MB/s':>8} {'read':>7} {'encode':>7} "
+          f"{'wait':>7} {'p50':>6} {'p99':>6}")
+    for run in runs:
+        stages, latency = run["stages_s"], run["batch_latency_s"]
+        print(f"{run['strategy']:<12} {run['repeat']:>3} {run['docs_per_s']:>10.0f} {run['mb_per_s']:>8.2f} "
+              f"{stages['read']:>7.2f} {stages['encode']:>7.2f} {stages['wait']:>7.2f} "
+              f"{latency['p50']:>6g} {latency['p99']:>6g}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import benchmark with synthetic OSM-like features")
+    parser.add_argument("--uri", default="mongodb://localhost:27017",
+                        help="mongod or mongos URI; several routers comma-separated")
+    parser.add_argument("--collection", default="bench_features", help="collection in OSM_DB (dropped before each run)")
+    parser.add_argument("--docs", type=int, default=100000, help="number of generated features")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent over hotspots, 0 = uniform")
+    parser.add_argument("--hotspots", type=int, default=20, help="number of hotspots for skewed data")
+    parser.add_argument("--spread", type=float, default=0.05, help="hotspot spread in degrees")
+    parser.add_argument("--polygon-ratio", type=float, default=0.3, help="share of polygon features")
+    parser.add_argument("--extra-tags", type=float, default=4, help="mean number of extra tags per feature")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["json", "ndjson", "bson"], default="bson", help="input file format")
+    parser.add_argument("--data-dir", help="where to write the generated file (default: temp dir)")
+    parser.add_argument("--strategies", default="thread:4,process:4,async:8",
+                        help="comma-separated pool:workers (thread, process, async)")
+    parser.add_argument("--batch-docs", type=int, default=dataImport.BATCH_DOCS)
+    parser.add_argument("--queue-size", type=int, default=0, help="max in-flight batches (default 2 * workers)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per strategy")
+    parser.add_argument("--zones", action="store_true", help="plan zones before each run on a sharded cluster")
+    parser.add_argument("--keep-collection", action="store_true", help="do not drop the collection at the end")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--metrics", help="also append per-collection metrics events (JSON lines) here")
+    args = parser.parse_args()
+    if args.metrics:
+        dataImport.METRICS_PATH = args.metrics
+    run_benchmark(args)
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure, PyMongoError
+from pymongo.uri_parser import parse_uri
+
+# Sdílená vrstva připojení ke clusteru pro importer i statistiky.
+# Každý router má v procesu jeden MongoClient s vlastním poolem spojení.
+MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 50))
+MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5000))
+SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", 300000))  # velké bulk inserty a agregace
+RETRY_BASE_DELAY = float(os.environ.get("MONGO_RETRY_BASE_DELAY", 0.25))  # s, první backoff
+RETRY_MAX_DELAY = float(os.environ.get("MONGO_RETRY_MAX_DELAY", 10))  # s, strop backoffu
+CONNECT_DEADLINE = float(os.environ.get("MONGO_CONNECT_DEADLINE", 120))  # s, jak dlouho čekat na cluster
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def split_uris(uris):
+    # "uri1,uri2" nebo seznam -> seznam URI routerů
+    if isinstance(uris, str):
+        uris = uris.split(",")
+    return [uri.strip() for uri in uris if uri.strip()]
+
+def required_uris(uris):
+    # split_uris pro připojení - bez jediného routeru by smyčky failoveru skončily nesrozumitelnou chybou
+    uris = split_uris(uris)
+    if not uris:
+        raise ValueError("no MongoDB URIs configured")
+    return uris
+
+def describe_uri(uri):
+    # host:port bez přihlašovacích údajů, pro výpisy
+    return ",".join(f"{host}:{port}" for host, port in parse_uri(uri)["nodelist"])
+
+def client_options(**overrides):
+    options = {
+        "maxPoolSize": MAX_POOL_SIZE,
+        "minPoolSize": MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": SOCKET_TIMEOUT_MS,
+    }
+    options.update(overrides)
+    return options
+
+def backoff_delays(base=RETRY_BASE_DELAY, cap=RETRY_MAX_DELAY):
+    # Exponenciální backoff s full jitter: náhodně z [0, min(cap, base * 2^n)],
+    # klienti po výpadku routeru se tak nevrací všichni ve stejný okamžik
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
+        attempt += 1
+
+def get_client(uri):
+    # MongoClient je thread-safe, stačí jeden na router v každém procesu
+    with _clients_lock:
+        if uri not in _clients:
+            _clients[uri] = MongoClient(uri, **client_options())
+        return _clients[uri]
+
+def connect_mongo(uris, deadline=CONNECT_DEADLINE, **options):
+    # Vrátí nového klienta na první router, který odpoví na ping; dokud cluster nenaběhne,
+    # zkouší routery dokola s backoffem - ready stav se pozná hned, bez pevných pauz
+    uris = required_uris(uris)
+    stop = time.monotonic() + deadline
+    delays = backoff_delays()
+    while True:
+        for uri in uris:
+            client = MongoClient(uri, **client_options(**options))
+            try:
+                client.admin.command("ping")
+                print(f"Connected to MongoDB ({describe_uri(uri)})")
+                return client
+            except PyMongoError as e:
+                client.close()
+                error = e
+        remaining = stop - time.monotonic()
+        if remaining <= 0:
+            print("Connection to MongoDB failed")
+            raise ConnectionFailure(f"No router reachable within {deadline:.0f}s: {error}")
+        delay = min(next(delays), remaining)
+        print(f"MongoDB not ready ({error}), retrying in {delay:.2f}s")
+        time.sleep(delay)
+
+def run_with_failover(uris, operation, start=0, deadline=CONNECT_DEADLINE):
+    # operation(client, attempt) na routeru uris[start]; při výpadku spojení pokračuje na dalším
+    # routeru, po každém neúspěšném kole přes všechny routery počká s backoffem.
+    # Ostatní chyby (BulkWriteError, OperationFailure) se propouští volajícímu.
+    uris = required_uris(uris)
+    stop = time.monotonic() + deadline
+    delays = backoff_delays()
+    attempt = 0
+    while True:
+        try:
+            return operation(get_client(uris[(start + attempt) % len(uris)]), attempt)
+        except ConnectionFailure as e:
+            attempt += 1
+            if time.monotonic() >= stop:
+                raise
+            if attempt % len(uris) == 0:
+                time.sleep(min(next(delays), max(stop - time.monotonic(), 0)))
+            print(f"Router unavailable ({e}), failing over")
+
+# === asyncio varianta (pymongo AsyncMongoClient, pymongo >= 4.13) ===
+
+def async_client(uri, **options):
+    # AsyncMongoClient patří k event loopu, ve kterém vznikl - necachuje se globálně
+    from pymongo import AsyncMongoClient
+    return AsyncMongoClient(uri, **client_options(**options))
+
+async def connect_mongo_async(uris, deadline=CONNECT_DEADLINE, **options):
+    uris = required_uris(uris)
+    stop = time.monotonic() + deadline
+    delays = backoff_delays()
+    while True:
+        for uri in uris:
+            client = async_client(uri, **options)
+            try:
+                await client.admin.command("ping")
+                print(f"Connected to MongoDB ({describe_uri(uri)})")
+                return client
+            except PyMongoError as e:
+                await client.close()
+                error = e
+        remaining = stop - time.monotonic()
+        if remaining <= 0:
+            raise ConnectionFailure(f"No router reachable within {deadline:.0f}s: {error}")
+        delay = min(next(delays), remaining)
+        print(f"MongoDB not ready ({error}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+async def run_with_failover_async(clients, operation, start=0, deadline=CONNECT_DEADLINE):
+    # Jako run_with_failover, jen nad předem vytvořenými AsyncMongoClient (jeden na router)
+    if not clients:
+        raise ValueError("no MongoDB URIs configured")
+    stop = time.monotonic() + deadline
+    delays = backoff_delays()
+    attempt = 0
+    while True:
+        try:
+            return await operation(clients[(start + attempt) % len(clients)], attempt)
+        except ConnectionFailure as e:
+            attempt += 1
+            if time.monotonic() >= stop:
+                raise
+            if attempt % len(clients) == 0:
+                await asyncio.sleep(min(next(delays), max(stop - time.monotonic(), 0)))
+            print(f"Router unavailable ({e}), failing over")
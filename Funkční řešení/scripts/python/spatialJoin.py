@@ -0,0 +1,171 @@
+import os
+from collections import Counter
+import numpy as np
+import shapely
+from dataCleaner import decode_geohashes, prefix_recorder, OUTPUT_FORMATS, INDEX_PREFIX
+from geojsonStream import iter_features, write_features, write_prefix_index, content_hash
+
+# Offline prostorové spojení nad vyčištěnými soubory (výstup dataCleaneru): ke každému ubytování
+# nejbližší atrakce a zastávky v okruhu, vložené do dokumentu jako pole "nearby".
+# Dotaz "co je poblíž hotelu" (7.3.6) je pak jediný find podle _id místo $lookup přes prefix geohashe,
+# který nevyužije index a přehlíží sousedy za hranou buňky.
+#
+#   python spatialJoin.py clean/accommodations.bson clean/tourist_attractions.bson \
+#       clean/transportation.bson data/accommodations.bson --radius 2000 --limit 10
+
+EARTH_RADIUS = 6371008.8  # m, střední poloměr Země (stejný jako u $geoNear se spherical: true)
+RADIUS = 2000  # m
+LIMIT = 10  # max sousedů od každého druhu
+QUERY_CHUNK = 5000  # kolik ubytování se dotazuje na strom najednou (omezuje počet kandidátních párů v paměti)
+STOP_TAGS = {
+    "highway": {"bus_stop"},
+    "railway": {"station", "halt", "tram_stop"},
+    "public_transport": {"platform", "stop_position", "station"},
+}
+
+def stop_type(properties):
+    # Typ zastávky podle STOP_TAGS, None = prvek transportation, který zastávkou není
+    for key, values in STOP_TAGS.items():
+        if properties.get(key) in values:
+            return properties[key]
+    return None
+
+def attraction_type(properties):
+    return properties.get("tourism")
+
+def feature_positions(features):
+    # (lon, lat) reprezentativního bodu: bod přímo, ostatní geometrie střed buňky geohashe,
+    # který dataCleaner spočítal z centroidu - polygony se tak znovu neparsují
+    lons, lats = np.zeros(len(features)), np.zeros(len(features))
+    other = []
+    for i, feature in enumerate(features):
+        geometry = feature["geometry"]
+        if geometry.get("type") == "Point":
+            lons[i], lats[i] = geometry["coordinates"][:2]
+        else:
+            other.append(i)
+    if other:
+        lats[other], lons[other] = decode_geohashes([features[i]["geohash"] for i in other])
+    return lons, lats
+
+def load_targets(path, classify):
+    # Kompaktní záznamy sousedů ({_id, name, type}) a jejich polohy
+    features, entries = [], []
+    for feature in iter_features(path):
+        kind = classify(feature.get("properties") or {})
+        if kind is None or not feature.get("geohash"):
+            continue
+        entry = {"_id": feature["_id"], "type": kind}
+        name = feature["properties"].get("name")
+        if name:
+            entry["name"] = name
+        features.append({"geometry": feature["geometry"], "geohash": feature["geohash"]})
+        entries.append(entry)
+    lons, lats = feature_positions(features)
+    return entries, lons, lats
+
+def project(lons, lats, scale_lat):
+    # Ekvidistantní válcová projekce v metrech, měřítko délky z nejsevernější šířky dat. Vzdálenost
+    # v projekci může skutečnou i přesáhnout (rovnoběžka je delší než ortodroma): pro body se |šířkou|
+    # <= scale_lat je nejvýš d / sinc(L/2), L = rozdíl délky v radiánech. Pro RADIUS 2 km a |šířku|
+    # do 85° to je pod 2 mm, dwithin s radius tedy vrátí prakticky všechny kandidáty; obecné okruhy
+    # viz geoQuery.search_distance
+    scale = np.cos(np.radians(scale_lat))
+    return np.radians(lons) * EARTH_RADIUS * scale, np.radians(lats) * EARTH_RADIUS
+
+def haversine(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def nearest_within(src_lons, src_lats, dst_lons, dst_lats, radius=RADIUS, limit=LIMIT):
+    # Pro každý zdrojový bod indexy a vzdálenosti nejvýš limit nejbližších cílů do radius metrů.
+    # Kandidáti z STRtree (dwithin v projekci), přesná vzdálenost haversinem, pořadí lexsortem.
+    result = [[] for _ in range(len(src_lons))]
+    if not len(src_lons) or not len(dst_lons):
+        return result
+    scale_lat = np.max(np.abs(np.concatenate([src_lats, dst_lats])))
+    tree = shapely.STRtree(shapely.points(*project(dst_lons, dst_lats, scale_lat)))
+    src_x, src_y = project(src_lons, src_lats, scale_lat)
+
+    for start in range(0, len(src_lons), QUERY_CHUNK):
+        stop = min(start + QUERY_CHUNK, len(src_lons))
+        queries = shapely.points(src_x[start:stop], src_y[start:stop])
+        q, t = tree.query(queries, predicate="dwithin", distance=radius)
+        q = q + start
+        dist = haversine(src_lons[q], src_lats[q], dst_lons[t], dst_lats[t])
+        keep = dist <= radius
+        q, t, dist = q[keep], t[keep], dist[keep]
+        order = np.lexsort((t, dist, q))
+        q, t, dist = q[order], t[order], dist[order]
+        # pořadí v rámci skupiny stejného q -> jen prvních limit
+        first = np.searchsorted(q, q, side="left")
+        rank = np.arange(len(q)) - first
+        keep = rank < limit
+        for i, j, d in zip(q[keep].tolist(), t[keep].tolist(), dist[keep].tolist()):
+            result[i].append((j, d))
+    return result
+
+def neighbour_entries(matches, entries):
+    return [{**entries[j], "dist": int(round(d))} for j, d in matches]
+
+def main(accommodations_file, attractions_file, transportation_file, output_file,
+         radius=RADIUS, limit=LIMIT, fmt=None, index_prefix=INDEX_PREFIX):
+    if os.path.abspath(accommodations_file) == os.path.abspath(output_file):
+        print("Chyba: výstup musí být jiný soubor než vstupní ubytování (čte se dvakrát).")
+        return
+    fmt = fmt or OUTPUT_FORMATS.get(os.path.splitext(output_file)[1], "json")
+
+    # 1. průchod: jen polohy ubytování, dokumenty se čtou až při zápisu
+    hosts = [{"geometry": f["geometry"], "geohash": f["geohash"]}
+             for f in iter_features(accommodations_file) if f.get("geohash")]
+    host_lons, host_lats = feature_positions(hosts)
+    del hosts
+
+    attractions, a_lons, a_lats = load_targets(attractions_file, attraction_type)
+    stops, s_lons, s_lats = load_targets(transportation_file, stop_type)
+    print(f"Ubytování: {len(host_lons)}, atrakce: {len(attractions)}, zastávky: {len(stops)}")
+
+    near_attractions = nearest_within(host_lons, host_lats, a_lons, a_lats, radius, limit)
+    near_stops = nearest_within(host_lons, host_lats, s_lons, s_lats, radius, limit)
+
+    def enriched():
+        i = 0
+        for feature in iter_features(accommodations_file):
+            if not feature.get("geohash"):
+                continue
+            feature["nearby"] = {
+                "radius": radius,
+                "attractions": neighbour_entries(near_attractions[i], attractions),
+                "stops": neighbour_entries(near_stops[i], stops),
+            }
+            feature["content_hash"] = content_hash(feature)
+            i += 1
+            yield feature
+
+    prefix_counts, prefix_bytes = Counter(), Counter()
+    record = prefix_recorder(prefix_counts, prefix_bytes, index_prefix) if fmt != "json" else None
+    written = write_features(output_file, enriched(), fmt, on_write=record)
+    if fmt != "json":
+        write_prefix_index(output_file, prefix_counts, index_prefix, prefix_bytes)
+
+    with_attractions = sum(1 for m in near_attractions if m)
+    with_stops = sum(1 for m in near_stops if m)
+    print(f"Zapsáno {written} ubytování, s atrakcí do {radius} m: {with_attractions}, se zastávkou: {with_stops}")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Předpočítání nejbližších atrakcí a zastávek ke každému ubytování")
+    parser.add_argument("accommodations_file", help="vyčištěné ubytování (.json / .ndjson / .bson)")
+    parser.add_argument("attractions_file", help="vyčištěné turistické atrakce")
+    parser.add_argument("transportation_file", help="vyčištěná doprava (použijí se jen zastávky a stanice)")
+    parser.add_argument("output_file", help="ubytování s polem nearby; pro importer pojmenovat accommodations.*")
+    parser.add_argument("--radius", type=int, default=RADIUS, help="okruh v metrech")
+    parser.add_argument("--limit", type=int, default=LIMIT, help="max počet atrakcí a zastávek na ubytování")
+    parser.add_argument("--format", choices=["json", "ndjson", "bson"], default=None,
+                        help="formát výstupu (výchozí podle přípony); u NDJSON a BSON vznikne i sidecar index")
+    parser.add_argument("--index-prefix", type=int, default=INDEX_PREFIX,
+                        help="délka prefixu geohashe v sidecar indexu")
+    args = parser.parse_args()
+    main(args.accommodations_file, args.attractions_file, args.transportation_file, args.output_file,
+         args.radius, args.limit, args.format, args.index_prefix)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import tempfile
+
+# Obsahově adresovaná cache vizualizací: klíč = hash vstupu + hash zdrojáků skriptů (+ konfigurace).
+# Uložené agregáty se znovu nepočítají, grafy/CSV se nepřekreslují, dokud se klíč nezmění.
+CACHE_DIR = os.environ.get(
+    "VISUALIZER_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "stats_output", ".cache"),
+)
+HASH_CHUNK = 1 << 20
+
+def _digest():
+    return hashlib.blake2b(digest_size=16)
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    # atomicky - cache může současně zapisovat víc procesů (dataVisualizerReport)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def _entry_path(kind, path):
+    # Jeden soubor na záznam (hash cesty) - souběžné procesy si navzájem nepřepisují cizí záznamy
+    name = hashlib.blake2b(os.path.abspath(path).encode("utf-8"), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, kind, name + ".json")
+
+def file_digest(path):
+    # Hash obsahu souboru; podle (velikost, mtime) se pamatuje, takže nezměněný soubor se nečte znovu
+    st = os.stat(path)
+    memo_path = _entry_path("digests", path)
+    entry = _read_json(memo_path)
+    if entry and entry[:2] == [st.st_size, st.st_mtime_ns]:
+        return entry[2]
+
+    h = _digest()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            h.update(chunk)
+    _write_json(memo_path, [st.st_size, st.st_mtime_ns, h.hexdigest()])
+    return h.hexdigest()
+
+def source_version(*paths):
+    # Verze kódu = hash zdrojáků; změna skriptu invaliduje jen to, co z něj vzniklo
+    h = _digest()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def cache_key(*parts):
+    h = _digest()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def load_cached(key):
+    return _read_json(os.path.join(CACHE_DIR, key + ".json"))
+
+def store_cached(key, value):
+    _write_json(os.path.join(CACHE_DIR, key + ".json"), value)
+
+def stale_outputs(paths, key):
+    # Výstupy, které chybí, vznikly z jiného klíče nebo je od té doby někdo přepsal
+    stale = []
+    for path in paths:
+        entry = _read_json(_entry_path("outputs", path))
+        if not os.path.isfile(path) or entry != [key, os.stat(path).st_mtime_ns]:
+            stale.append(path)
+    return stale
+
+def record_outputs(paths, key):
+    for path in paths:
+        _write_json(_entry_path("outputs", path), [key, os.stat(path).st_mtime_ns])
+
+def stale_renders(tasks, key):
+    # tasks = [(funkce, argumenty)], poslední argument je výstupní soubor
+    stale = set(stale_outputs([plot_args[-1] for _, plot_args in tasks], key))
+    return [(plot, plot_args) for plot, plot_args in tasks if plot_args[-1] in stale]
+
+def record_renders(tasks, key):
+    record_outputs([plot_args[-1] for _, plot_args in tasks], key)
@@ -1,11 +1,18 @@
-import json
+import gc
+import math
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from pprint import pprint
 import sys
 import os
 from collections import Counter
+import shapely
 from shapely.geometry import shape, Polygon, Point, LineString, MultiPolygon, MultiLineString, GeometryCollection
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from geojsonStream import detect_container, iter_features
+from dataVisualizerAggregates import write_columnar
+from dataVisualizerCache import cache_key, file_digest, source_version, load_cached, store_cached, stale_outputs, record_outputs
 
 USELESS_KEYS = {
     'note', 'fixme', 'comment', 'source', 'attribution',
@@ -18,106 +25,272 @@ USELESS_VALUES = {
     None, False, 0, "yes", "true", "1"
 }
 
+# jen řetězcové zbytečné hodnoty - str(v) se s None/False/0 v USELESS_VALUES stejně nikdy nerovná
+USELESS_STRINGS = frozenset(v for v in USELESS_VALUES if isinstance(v, str))
+MAX_USELESS_LENGTH = max(map(len, USELESS_STRINGS))
+_useful_keys = {}  # klíč -> není v USELESS_KEYS (klíče se mezi feature opakují)
+
+ANALYZE_BATCH = 5000  # po kolika feature se počítá validita geometrií
+
+def _is_useful_key(key):
+    useful = _useful_keys.get(key)
+    if useful is None:
+        useful = _useful_keys[key] = key.lower() not in USELESS_KEYS
+    return useful
+
 def is_useful_properties(props):
     if not props or not isinstance(props, dict):
         return False
     for k, v in props.items():
-        key_lower = k.lower()
-        if key_lower in USELESS_KEYS:
+        if not _is_useful_key(k):
             continue
-        val_str = str(v).strip().lower() if v is not None else ""
-        if val_str in USELESS_VALUES:
+        if type(v) is str:
+            val_str = v.strip()
+            # delší řetězec nemůže být žádná ze zbytečných hodnot, lower() není potřeba
+            if len(val_str) > MAX_USELESS_LENGTH:
+                return True
+            val_str = val_str.lower()
+        else:
+            val_str = str(v).strip().lower() if v is not None else ""
+        if val_str in USELESS_STRINGS:
             continue
         if val_str and len(val_str) > 1:
             return True
     return False
 
-def analyze_geojson(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        features = json.load(f)
+def _is_position(pos):
+    if type(pos) is not list or not 2 <= len(pos) <= 3:
+        return False
+    for c in pos:
+        # -inf < c < inf odfiltruje i NaN
+        if (type(c) is not float and type(c) is not int) or not -math.inf < c < math.inf:
+            return False
+    return True
+
+# Struktura se kontroluje jen po úroveň čar a prstenců (počty bodů, uzavření prstence);
+# jednotlivé body ověří až převod celé dávky na numpy pole v flat_coordinates
+def _is_line(coords, min_length=2):
+    return type(coords) is list and len(coords) >= min_length
+
+def _is_ring(coords):
+    return _is_line(coords, 4) and coords[0] == coords[-1]
+
+def _is_polygon(coords):
+    return type(coords) is list and len(coords) > 0 and all(_is_ring(ring) for ring in coords)
+
+def _is_multi(coords, check):
+    return type(coords) is list and len(coords) > 0 and all(check(c) for c in coords)
+
+STRUCTURE_CHECKS = {
+    "Point": _is_position,
+    "MultiPoint": lambda coords: _is_multi(coords, _is_position),
+    "LineString": _is_line,
+    "MultiLineString": lambda coords: _is_multi(coords, _is_line),
+    "Polygon": _is_polygon,
+    "MultiPolygon": lambda coords: _is_multi(coords, _is_polygon),
+}
+
+def classify_geometry(geom_dict):
+    # Typ geometrie přímo ze struktury souřadnic, bez shapely. None = nestandardní případ
+    # (prázdné souřadnice, GeometryCollection, neuzavřený prstenec...), o kterém rozhodne shape()
+    if not isinstance(geom_dict, dict):
+        return None
+    geom_type = geom_dict.get("type")
+    check = STRUCTURE_CHECKS.get(geom_type)
+    if check is not None and check(geom_dict.get("coordinates")):
+        return geom_type
+    return None
+
+def point_issues(lon, lat):
+    causes = []
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        causes.append("geom_point_out_of_bounds")
+    if abs(lon) < 1e-7 and abs(lat) < 1e-7:
+        causes.append("geom_point_at_origin")
+    return causes
+
+def flat_coordinates(geometries):
+    # Všechny čáry a prstence dávky jako jedno pole souřadnic + počty bodů po částech.
+    # Vrací None, když souřadnice nejsou čísla nebo se v dávce míchá 2D a 3D - pak rozhodne shape().
+    line_coords, line_counts, line_owners = [], [], []
+    ring_coords, ring_counts, ring_polys, poly_owners = [], [], [], []
+    for i, (geom_type, geom_coords) in enumerate(geometries):
+        if geom_type in ("LineString", "MultiLineString"):
+            lines = [geom_coords] if geom_type == "LineString" else geom_coords
+            for line in lines:
+                line_coords.extend(line)
+                line_counts.append(len(line))
+                line_owners.append(i)
+        else:
+            polygons = [geom_coords] if geom_type == "Polygon" else geom_coords
+            for rings in polygons:
+                for ring in rings:
+                    ring_coords.extend(ring)
+                    ring_counts.append(len(ring))
+                    ring_polys.append(len(poly_owners))
+                poly_owners.append(i)
+    try:
+        array = np.array(line_coords + ring_coords, dtype=float)
+    except (ValueError, TypeError):
+        return None
+    if array.ndim != 2 or array.shape[1] not in (2, 3):
+        return None
+    # validita je v GEOS jen 2D, případná třetí souřadnice se zahodí
+    n_line = len(line_coords)
+    return {
+        "lines": (array[:n_line, :2], line_counts, line_owners),
+        "rings": (array[n_line:, :2], ring_counts, ring_polys, poly_owners),
+    }
 
-    if not isinstance(features, list):
+def _part_indices(counts):
+    return np.repeat(np.arange(len(counts)), counts)
+
+def batch_validity(n, flat):
+    # is_valid pro celou dávku: shapely geometrie se postaví najednou z plochého pole souřadnic
+    # (linestrings/linearrings/polygons s indices) místo shape() pro každou feature zvlášť.
+    # MultiLineString je validní, když jsou validní všechny jeho čáry; plochy se skládají
+    # do MultiPolygonu (u jednoho polygonu má stejnou validitu).
+    valid = np.ones(n, dtype=bool)
+    coords, counts, owners = flat["lines"]
+    if counts:
+        lines = shapely.linestrings(coords, indices=_part_indices(counts))
+        np.logical_and.at(valid, np.array(owners), shapely.is_valid(lines))
+    coords, counts, ring_polys, poly_owners = flat["rings"]
+    if counts:
+        rings = shapely.linearrings(coords, indices=_part_indices(counts))
+        polygons = shapely.polygons(rings, indices=np.array(ring_polys))
+        owners, inverse = np.unique(poly_owners, return_inverse=True)
+        valid[owners] = shapely.is_valid(shapely.multipolygons(polygons, indices=inverse))
+    return valid
+
+def shape_issues(geom_dict, check_validity=True):
+    # Původní cesta přes shape() pro geometrie, které nejde posoudit ze struktury
+    try:
+        geom = shape(geom_dict)
+    except Exception:
+        return None, ["geom_invalid_format"]
+    causes = []
+    if check_validity and not geom.is_valid:
+        causes.append("geom_invalid")
+    if isinstance(geom, Point) and not geom.is_empty:
+        coords = list(geom.coords)[0]
+        causes.extend(point_issues(coords[0], coords[1]))
+    return geom.geom_type, causes
+
+def geometry_issues(geom_dicts, check_validity=True):
+    # Pro každou geometrii dávky (typ podle shapely nebo None, seznam příčin problémů).
+    # Běžné geometrie se klasifikují ze souřadnic a validují dávkově, ostatní jdou přes shape().
+    results = []
+    pending, pending_idx = [], []
+    for geom_dict in geom_dicts:
+        if not geom_dict:
+            results.append((None, ["geom_missing"]))
+            continue
+        geom_type = classify_geometry(geom_dict)
+        if geom_type == "Point":
+            coords = geom_dict["coordinates"]
+            results.append((geom_type, point_issues(coords[0], coords[1])))
+        elif geom_type == "MultiPoint":
+            results.append((geom_type, []))
+        elif geom_type is not None:
+            pending.append((geom_type, geom_dict["coordinates"]))
+            pending_idx.append(len(results))
+            results.append((geom_type, []))
+        else:
+            results.append(shape_issues(geom_dict, check_validity))
+
+    if pending:
+        flat = flat_coordinates(pending)
+        if flat is None:
+            for i in pending_idx:
+                results[i] = shape_issues(geom_dicts[i], check_validity)
+        elif check_validity:
+            for i, is_valid in zip(pending_idx, batch_validity(len(pending), flat)):
+                if not is_valid:
+                    results[i][1].append("geom_invalid")
+    return results
+
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def analyze_geojson(file_path, check_validity=True):
+    # Vstup se čte proudově (pole feature, NDJSON nebo BSON); diagnostika jednotlivých feature
+    # se netiskne, ale jde do sloupce causes v details
+    if detect_container(file_path) not in ("array", "ndjson", "bson"):
         raise ValueError("Expected input to be a JSON array of GeoJSON features.")
-
-    total = len(features)
+    # smyčka vytváří jen acyklické objekty (řádky details), cyklický GC by je opakovaně procházel zbytečně
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _analyze_features(iter_features(file_path), check_validity)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def _analyze_features(features, check_validity):
+
+    total = 0
     no_geom = 0
     bad_geom = 0
-    no_props = 0
     useful_props = 0
     empty_features = 0
 
-    geom_type_counter = Counter()
-    osm_type_counter = Counter()
+    # typy se sbírají do seznamů a počítají až na konci (Counter[...] += 1 pro každou feature je drahé)
+    geom_types = []
+    osm_types = []
     invalid_geom_reasons_counter = Counter()
 
     details = []
 
-    for idx, feature in enumerate(features):
-        geom_dict = feature.get("geometry")
-        props = feature.get("properties", {})
-        fid = feature.get("_id", feature.get("id", f"idx_{idx}"))
-
-        osm_type = None
-        if isinstance(fid, str) and '/' in fid:
-            osm_type = fid.split('/')[0]
-        osm_type_counter[osm_type] += 1
-
-        geom = None
-        geom_issue_causes = []
-
-        if geom_dict:
-            try:
-                geom = shape(geom_dict)
-                geom_type_counter[geom.geom_type] += 1
-            except Exception:
-                geom = None
-                geom_issue_causes.append("geom_invalid_format")
-        else:
-            geom_issue_causes.append("geom_missing")
-
-        if geom is None:
-            no_geom += 1
-        else:
-            if not geom.is_valid:
-                geom_issue_causes.append("geom_invalid")
-            if isinstance(geom, Point):
-                coords = list(geom.coords)[0]
-                lon, lat = coords[0], coords[1]
-                if not (-180 <= lon <= 180 and -90 <= lat <= 90):
-                    geom_issue_causes.append("geom_point_out_of_bounds")
-                if abs(lon) < 1e-7 and abs(lat) < 1e-7:
-                    geom_issue_causes.append("geom_point_at_origin")
-
-        geom_ok = (len(geom_issue_causes) == 0)
-        if not geom_ok:
-            bad_geom += 1
-            for cause in geom_issue_causes:
-                invalid_geom_reasons_counter[cause] += 1
-            print(f"Removed feature due to geometry issues: {fid} causes: {geom_issue_causes}")
-
-        props_ok = is_useful_properties(props)
-        if props_ok:
-            useful_props += 1
-        else:
-            no_props += 1
-
-        causes = []
-        if geom_issue_causes:
-            causes.extend(geom_issue_causes)
-        if not props_ok:
-            causes.append("no_useful_props")
-
-        empty = (not geom_ok) and (not props_ok)
-        if empty:
-            empty_features += 1
-
-        details.append({
-            "feature_id": fid,
-            "osm_type": osm_type,
-            "geometry_type": geom_dict.get("type") if geom_dict else None,
-            "empty": empty,
-            "causes": ", ".join(causes) if causes else "none",
-        })
+    for batch in iter_batches(features, ANALYZE_BATCH):
+        geom_dicts = [feature.get("geometry") for feature in batch]
+        issues = geometry_issues(geom_dicts, check_validity)
+        for feature, geom_dict, (geom_type, geom_issue_causes) in zip(batch, geom_dicts, issues):
+            fid = feature.get("_id", feature.get("id", f"idx_{total}"))
+            total += 1
+
+            osm_type = fid.split('/', 1)[0] if isinstance(fid, str) and '/' in fid else None
+            osm_types.append(osm_type)
+
+            if geom_type is None:
+                no_geom += 1
+            else:
+                geom_types.append(geom_type)
+
+            geom_ok = not geom_issue_causes
+            if not geom_ok:
+                bad_geom += 1
+                invalid_geom_reasons_counter.update(geom_issue_causes)
+
+            props_ok = is_useful_properties(feature.get("properties", {}))
+            if props_ok:
+                useful_props += 1
+                causes = geom_issue_causes
+            else:
+                causes = geom_issue_causes + ["no_useful_props"]
+
+            empty = (not geom_ok) and (not props_ok)
+            if empty:
+                empty_features += 1
+
+            details.append({
+                "feature_id": fid,
+                "osm_type": osm_type,
+                "geometry_type": geom_dict.get("type") if geom_dict else None,
+                "empty": empty,
+                "causes": ", ".join(causes) if causes else "none",
+            })
+
+    no_props = total - useful_props
+    geom_type_counter = Counter(geom_types)
+    osm_type_counter = Counter(osm_types)
 
     summary = {
         "Total Features": total,
@@ -188,27 +361,58 @@ def visualize_summary(summary, output_prefix):
     plt.close()
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python script.py path/to/features.json")
-        sys.exit(1)
-
-    file_path = sys.argv[1]
+    import argparse
+    parser = argparse.ArgumentParser(description="GeoJSON features usefulness analysis")
+    parser.add_argument("file_path", help="path/to/features.json (JSON array, .ndjson or .bson)")
+    # --fast: bez kontroly is_valid, jen typy, souřadnice a vlastnosti (bez shapely pro běžné geometrie)
+    parser.add_argument("--fast", action="store_true", help="skip the geometry is_valid check")
+    parser.add_argument("--details-format", choices=["csv", "parquet", "feather"], default="csv",
+                        help="per-feature details as CSV or as columnar Parquet / Arrow (needs pyarrow)")
+    args = parser.parse_args()
+    file_path = args.file_path
+    check_validity = not args.fast
     if not os.path.isfile(file_path):
         print(f"File not found: {file_path}")
         sys.exit(1)
 
-    summary, details = analyze_geojson(file_path)
-    pprint(summary)
-
     base = os.path.splitext(os.path.basename(file_path))[0]
     output_prefix = f"{base}_usefulness"
+    summary_csv = f"{output_prefix}.csv"
+    details_path = f"{output_prefix}_details.{args.details_format}"
+    charts = [
+        f"{output_prefix}_usefulness_analysis.png",
+        f"{output_prefix}_geometry_types_pie.png",
+        f"{output_prefix}_osm_types_pie.png",
+    ]
 
-    pd.DataFrame([summary]).to_csv(f"{output_prefix}.csv", index=False)
-    pd.DataFrame(details).to_csv(f"{output_prefix}_details.csv", index=False)
+    # summary i výstupy jsou vázané na hash vstupu a tohoto skriptu; details se necachují,
+    # soubor s nimi ale ano - analýza se spustí jen když chybí nebo je zastaralý
+    key = cache_key("usefulness", file_digest(file_path), source_version(__file__), check_validity)
+    stale = stale_outputs([summary_csv, details_path] + charts, key)
+    summary = load_cached(key)
+    if summary is None or details_path in stale:
+        summary, details = analyze_geojson(file_path, check_validity)
+        store_cached(key, summary)
+        if args.details_format == "csv":
+            pd.DataFrame(details).to_csv(details_path, index=False)
+        else:
+            # osm_type a geometry_type se uloží slovníkově kódované
+            write_columnar(pd.DataFrame(details), details_path)
+        if summary["Invalid Geometry"]:
+            print(f"Features with geometry issues: {summary['Invalid Geometry']} (causes in {details_path})")
+    elif not stale:
+        print(f"Outputs for {file_path} are up to date (cached).")
+    pprint(summary)
 
-    visualize_summary(summary, output_prefix)
-    visualize_pie(summary["Geometry Types Counts"], "Geometry Types Distribution", f"{output_prefix}_geometry_types_pie.png")
-    visualize_pie(summary["OSM Types Counts"], "OSM Types Distribution", f"{output_prefix}_osm_types_pie.png")
+    if summary_csv in stale:
+        pd.DataFrame([summary]).to_csv(summary_csv, index=False)
+    if charts[0] in stale:
+        visualize_summary(summary, output_prefix)
+    if charts[1] in stale:
+        visualize_pie(summary["Geometry Types Counts"], "Geometry Types Distribution", charts[1])
+    if charts[2] in stale:
+        visualize_pie(summary["OSM Types Counts"], "OSM Types Distribution", charts[2])
+    record_outputs(stale, key)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,80 @@
+import os
+import time
+import matplotlib
+matplotlib.use("Agg")  # headless backend - grafy se kreslí v procesech bez displeje
+from concurrent.futures import ProcessPoolExecutor
+from dataVisualizerAggregates import render_key
+from dataVisualizerCache import stale_renders, record_renders
+import dataVisualizerAccommodations
+import dataVisualizerTouristAttractions
+import dataVisualizerTransportation
+
+# dataset -> modul s load_aggregates/render_tasks; názvy odpovídají kolekcím i podadresářům stats_output
+DATASETS = {
+    "accommodations": dataVisualizerAccommodations,
+    "tourist_attractions": dataVisualizerTouristAttractions,
+    "transportation": dataVisualizerTransportation,
+}
+
+def render(plot, plot_args):
+    start = time.perf_counter()
+    plot(*plot_args)
+    return time.perf_counter() - start
+
+def main(inputs, output_dir, mongo_uri=None, workers=None, use_cache=True):
+    # 1) agregace všech datasetů souběžně, 2) všechny grafy všech datasetů souběžně;
+    # celková doba je zhruba doba nejpomalejšího grafu (typicky wordcloud)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {name: pool.submit(DATASETS[name].load_aggregates, path, mongo_uri, use_cache)
+                   for name, path in inputs.items()}
+        aggregates = {name: fut.result() for name, fut in pending.items()}
+        print(f"Agregace hotová za {time.perf_counter() - start:.2f}s")
+
+        renders = []
+        for name, agg in aggregates.items():
+            if not agg["total"]:
+                print(f"{name}: data jsou prázdná, přeskakuji.")
+                continue
+            dataset_dir = os.path.join(output_dir, name)
+            os.makedirs(dataset_dir, exist_ok=True)
+            module = DATASETS[name]
+            tasks = module.render_tasks(agg, dataset_dir)
+            key = render_key(agg, module.__file__)
+            # kreslí se jen grafy, jejichž agregáty nebo kód se od posledního běhu změnily
+            for plot, plot_args in (stale_renders(tasks, key) if use_cache else tasks):
+                renders.append((name, key, (plot, plot_args), pool.submit(render, plot, plot_args)))
+        if not renders:
+            print("Všechny grafy jsou aktuální.")
+
+        for name, key, task, fut in renders:
+            print(f"{name}/{task[0].__name__}: {fut.result():.2f}s")
+            record_renders([task], key)
+    print(f"Report hotový za {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    import argparse
+    from dataVisualizerAggregates import DEFAULT_MONGO_URI
+    parser = argparse.ArgumentParser(description="Všechny vizualizace všech datasetů v jednom běhu")
+    parser.add_argument("output_dir", help="výstupní adresář (vzniknou podadresáře podle datasetů)")
+    parser.add_argument("--data-dir", help="adresář s <dataset>.parquet / .feather / .bson / .ndjson / .json soubory")
+    for name in DATASETS:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, help=f"vstupní soubor pro {name}")
+    parser.add_argument("--from-mongo", action="store_true", help="agregace v clusteru místo lokálních souborů")
+    parser.add_argument("--mongo-uri", default=DEFAULT_MONGO_URI)
+    parser.add_argument("--workers", type=int, default=None, help="počet procesů (výchozí počet jader)")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="přepočítat agregáty i grafy bez ohledu na cache")
+    args = parser.parse_args()
+
+    inputs = {}
+    for name in DATASETS:
+        path = getattr(args, name)
+        if not path and args.data_dir:
+            path = next((os.path.join(args.data_dir, name + ext) for ext in (".parquet", ".feather", ".bson", ".ndjson", ".json")
+                         if os.path.isfile(os.path.join(args.data_dir, name + ext))), None)
+        if path or args.from_mongo:
+            inputs[name] = path
+    if not inputs:
+        parser.error("zadejte --data-dir, vstupní soubory nebo --from-mongo")
+    main(inputs, args.output_dir, args.mongo_uri if args.from_mongo else None, args.workers, args.use_cache)
@@ -1,11 +1,10 @@
-import sys
 import os
-import json
 import matplotlib.pyplot as plt
-import pandas as pd
-import re
-from collections import Counter
+from dataVisualizerCache import stale_renders, record_renders
 from wordcloud import WordCloud
+from dataVisualizerAggregates import cached_aggregate_file, render_key, write_extract, aggregate_collection, wordcloud_frequencies, parse_args
+
+COLLECTION = "tourist_attractions"  # kolekce v OSM_DB pro --from-mongo
 
 # Definice kategorií podle OSM tagů pro turistické atrakce
 CATEGORY_TAGS = {
@@ -42,50 +41,11 @@ def detect_category(tags):
                 return val_map[None]
     return None
 
-def load_data_flexible(filepath):
-    with open(filepath, encoding='utf-8') as f:
-        data = json.load(f)
-
-    if isinstance(data, dict):
-        if "features" in data:
-            features = data["features"]
-        elif "elements" in data:
-            features = data["elements"]
-        else:
-            raise ValueError("Neočekávaný formát vstupu, chybí 'features' i 'elements'")
-    elif isinstance(data, list):
-        features = data
-    else:
-        raise ValueError("Neočekávaný formát vstupu, očekávám dict nebo list")
-
-    records = []
-    for feature in features:
-        # GeoJSON má vlastnosti v "properties", Overpass v "tags"
-        if "properties" in feature:
-            tags = feature.get("properties", {})
-        else:
-            tags = feature.get("tags", {})
-
-        category = detect_category(tags)
-        records.append({
-            "category": category,
-            "tags": tags,
-            "has_name": "name" in tags,
-            "name": tags.get("name", ""),
-            "geometry_type": feature.get("geometry", {}).get("type", "") if "geometry" in feature else feature.get("type", ""),
-            "id": feature.get("id", ""),
-        })
-
-    df = pd.DataFrame(records)
-    return df
-
-def plot_category_distribution(df, output_path):
-    categories = df['category'].dropna()
-    if categories.empty:
+def plot_category_distribution(counts, output_path):
+    if not counts:
         print("Nebyly nalezeny žádné platné kategorie pro vizualizaci.")
         return
 
-    counts = Counter(categories)
     total = sum(counts.values())
     sorted_items = sorted(counts.items(), key=lambda x: x[1], reverse=True)
     labels, sizes = zip(*sorted_items)
@@ -115,15 +75,13 @@ def plot_category_distribution(df, output_path):
     plt.close()
     print(f"Graf kategorií uložen do: {output_path}")
 
-def plot_name_wordcloud(df, output_path):
-    names = df[df["has_name"]]["name"]
-    if names.empty:
+def plot_name_wordcloud(agg, output_path):
+    if not agg["named"]:
         print("Nejsou k dispozici žádná jména pro wordcloud.")
         return
 
-    text = " ".join(names)
-    text = re.sub(r'[^\w\s]', '', text)
-    wordcloud = WordCloud(width=800, height=400, background_color='white', collocations=False).generate(text)
+    wordcloud = WordCloud(width=800, height=400, background_color='white', collocations=False)
+    wordcloud.generate_from_frequencies(wordcloud_frequencies(agg["name_tokens"], wordcloud))
 
     plt.figure(figsize=(10,5))
     plt.imshow(wordcloud, interpolation='bilinear')
@@ -134,13 +92,8 @@ def plot_name_wordcloud(df, output_path):
     plt.close()
     print(f"Wordcloud uložen do: {output_path}")
 
-def plot_top_osm_tags(df, top_n, output_path):
-    all_keys = []
-    for tags in df["tags"]:
-        all_keys.extend(tags.keys())
-
-    counter = Counter(all_keys)
-    most_common = counter.most_common(top_n)
+def plot_top_osm_tags(tag_keys, top_n, output_path):
+    most_common = tag_keys.most_common(top_n)
     if not most_common:
         print("Nenalezeny žádné OSM tagy pro vizualizaci.")
         return
@@ -156,22 +109,40 @@ def plot_top_osm_tags(df, top_n, output_path):
     plt.close()
     print(f"Graf OSM tagů uložen do: {output_path}")
 
-def main(input_file, output_dir):
+def load_aggregates(input_file, mongo_uri=None, use_cache=True):
+    source = f"OSM_DB.{COLLECTION}" if mongo_uri else input_file
+    print(f"Načítám data z: {source}")
+    if mongo_uri:
+        return aggregate_collection(mongo_uri, COLLECTION, CATEGORY_TAGS)
+    return cached_aggregate_file(input_file, detect_category, __file__, use_cache)
+
+def render_tasks(agg, output_dir):
+    # (funkce, argumenty) pro každý graf - main je kreslí postupně, dataVisualizerReport paralelně
+    return [
+        (plot_category_distribution, (agg["categories"], os.path.join(output_dir, "category_distribution.png"))),
+        (plot_name_wordcloud, (agg, os.path.join(output_dir, "name_wordcloud.png"))),
+        (plot_top_osm_tags, (agg["tag_keys"], 20, os.path.join(output_dir, "top_osm_tags.png"))),
+    ]
+
+def main(input_file, output_dir, mongo_uri=None, use_cache=True, extract_path=None):
     os.makedirs(output_dir, exist_ok=True)
-    print(f"Načítám data ze souboru: {input_file}")
-    df = load_data_flexible(input_file)
-    if df.empty:
+    if extract_path:
+        write_extract(input_file, detect_category, extract_path)
+        input_file = extract_path
+    agg = load_aggregates(input_file, mongo_uri, use_cache)
+    if not agg["total"]:
         print("Data jsou prázdná, není co vizualizovat.")
         return
 
-    plot_category_distribution(df, os.path.join(output_dir, "category_distribution.png"))
-    plot_name_wordcloud(df, os.path.join(output_dir, "name_wordcloud.png"))
-    plot_top_osm_tags(df, top_n=20, output_path=os.path.join(output_dir, "top_osm_tags.png"))
+    tasks = render_tasks(agg, output_dir)
+    key = render_key(agg, __file__)
+    stale = stale_renders(tasks, key) if use_cache else tasks
+    if not stale:
+        print(f"Grafy v {output_dir} jsou aktuální.")
+    for plot, plot_args in stale:
+        plot(*plot_args)
+    record_renders(stale, key)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Použití: python dataVisualizerTouristAttractions.py vstup.json vystupní_adresář")
-        sys.exit(1)
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2]
-    main(input_file, output_dir)
+    args = parse_args(os.path.basename(__file__), "vstup.json nebo sloupcový výřez .parquet / .feather")
+    main(args.input_file, args.output_dir, args.mongo_uri, args.use_cache, args.write_extract)
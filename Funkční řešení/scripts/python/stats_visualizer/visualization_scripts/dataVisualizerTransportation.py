@@ -1,10 +1,9 @@
-import sys
 import os
-import json
 import matplotlib.pyplot as plt
-import pandas as pd
-import re
-from collections import Counter
+from dataVisualizerCache import stale_renders, record_renders
+from dataVisualizerAggregates import cached_aggregate_file, render_key, write_extract, aggregate_collection, wordcloud_frequencies, parse_args
+
+COLLECTION = "transportation"  # kolekce v OSM_DB pro --from-mongo
 
 CATEGORY_TAGS = {
     "highway": {
@@ -28,42 +27,7 @@ def detect_category(properties):
             return values[val]
     return None
 
-def load_data(filepath):
-    with open(filepath, encoding='utf-8') as f:
-        data = json.load(f)
-
-    if isinstance(data, dict) and "features" in data:
-        features = data["features"]
-    elif isinstance(data, list):
-        features = data
-    else:
-        raise ValueError("Neočekávaný formát vstupu: očekávám GeoJSON s 'features' nebo pole objektů")
-
-    records = []
-    total_railway_stations = 0
-    subway_stations_count = 0
-
-    for feature in features:
-        props = feature.get("properties", {})
-        category = detect_category(props)
-        if props.get("railway") == "station":
-            total_railway_stations += 1
-            if props.get("subway") == "yes":
-                subway_stations_count += 1
-
-        records.append({
-            "category": category,
-            "raw_properties": props,
-            "has_name": "name" in props,
-            "name": props.get("name"),
-            "subway": props.get("subway"),
-        })
-
-    df = pd.DataFrame(records)
-    return df, total_railway_stations, subway_stations_count
-
-def plot_bar_chart(categories, output_path):
-    counts = Counter(categories)
+def plot_bar_chart(counts, output_path):
     total = sum(counts.values())
     sorted_items = sorted(counts.items(), key=lambda x: x[1]/total, reverse=True)
     labels, sizes = zip(*sorted_items)
@@ -120,12 +84,10 @@ def plot_railway_vs_subway(total_railway_stations, subway_stations_count, output
     plt.close()
     print(f"Railway vs Subway bar chart uložen do souboru: {output_path}")
 
-def plot_wordcloud_names(df, output_path):
+def plot_wordcloud_names(name_tokens, output_path):
     from wordcloud import WordCloud
-    names = df[df["has_name"] == True]["raw_properties"].apply(lambda p: p.get("name", ""))
-    text = " ".join(names)
-    text = re.sub(r'[^\w\s]', '', text)
-    wordcloud = WordCloud(width=800, height=400, background_color='white', collocations=False).generate(text)
+    wordcloud = WordCloud(width=800, height=400, background_color='white', collocations=False)
+    wordcloud.generate_from_frequencies(wordcloud_frequencies(name_tokens, wordcloud))
     plt.figure(figsize=(10,5))
     plt.imshow(wordcloud, interpolation='bilinear')
     plt.axis('off')
@@ -135,12 +97,8 @@ def plot_wordcloud_names(df, output_path):
     plt.close()
     print(f"Wordcloud uložen do souboru: {output_path}")
 
-def plot_osm_tags(df, top_n, output_path):
-    all_keys = []
-    for props in df["raw_properties"]:
-        all_keys.extend(props.keys())
-    counter = Counter(all_keys)
-    most_common = counter.most_common(top_n)
+def plot_osm_tags(tag_keys, top_n, output_path):
+    most_common = tag_keys.most_common(top_n)
     keys, counts = zip(*most_common)
 
     fig, ax = plt.subplots(figsize=(10,6))
@@ -153,23 +111,39 @@ def plot_osm_tags(df, top_n, output_path):
     plt.close()
     print(f"OSM tags bar chart uložen do souboru: {output_path}")
 
-def main(filepath, output_dir):
+def load_aggregates(input_file, mongo_uri=None, use_cache=True):
+    if mongo_uri:
+        return aggregate_collection(mongo_uri, COLLECTION, CATEGORY_TAGS)
+    return cached_aggregate_file(input_file, detect_category, __file__, use_cache)
+
+def render_tasks(agg, output_dir):
+    # (funkce, argumenty) pro každý graf - main je kreslí postupně, dataVisualizerReport paralelně
+    return [
+        (plot_bar_chart, (agg["categories"], os.path.join(output_dir, "public_transport_bar.png"))),
+        (plot_railway_vs_subway, (agg["railway_stations"], agg["subway_stations"], os.path.join(output_dir, "railway_vs_subway.png"))),
+        (plot_wordcloud_names, (agg["name_tokens"], os.path.join(output_dir, "wordcloud_names.png"))),
+        (plot_osm_tags, (agg["tag_keys"], 20, os.path.join(output_dir, "osm_tags.png"))),
+    ]
+
+def main(filepath, output_dir, mongo_uri=None, use_cache=True, extract_path=None):
     os.makedirs(output_dir, exist_ok=True)
-
-    df, total_railway_stations, subway_stations_count = load_data(filepath)
-    if df.empty:
+    if extract_path:
+        write_extract(filepath, detect_category, extract_path)
+        filepath = extract_path
+    agg = load_aggregates(filepath, mongo_uri, use_cache)
+    if not agg["total"]:
         print("Data jsou prázdná nebo bez platných kategorií.")
         return
 
-    plot_bar_chart(df['category'].dropna(), os.path.join(output_dir, "public_transport_bar.png"))
-    plot_railway_vs_subway(total_railway_stations, subway_stations_count, os.path.join(output_dir, "railway_vs_subway.png"))
-    plot_wordcloud_names(df, os.path.join(output_dir, "wordcloud_names.png"))
-    plot_osm_tags(df, top_n=20, output_path=os.path.join(output_dir, "osm_tags.png"))
+    tasks = render_tasks(agg, output_dir)
+    key = render_key(agg, __file__)
+    stale = stale_renders(tasks, key) if use_cache else tasks
+    if not stale:
+        print(f"Grafy v {output_dir} jsou aktuální.")
+    for plot, plot_args in stale:
+        plot(*plot_args)
+    record_renders(stale, key)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Použití: python dataVisualizerTransportation.py vstup.geojson vystupni_adresar")
-        sys.exit(1)
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2]
-    main(input_path, output_dir)
+    args = parse_args(os.path.basename(__file__), "vstup.geojson nebo sloupcový výřez .parquet / .feather")
+    main(args.input_file, args.output_dir, args.mongo_uri, args.use_cache, args.write_extract)
@@ -0,0 +1,100 @@
+import os
+import sys
+from collections import Counter
+from pymongo.errors import BulkWriteError
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "importer"))
+
+from geojsonStream import write_features, write_prefix_index, content_hash
+from dataImport import sync_json_file
+
+class FakeBulk:
+    # Sběr operací jako pymongo _Bulk (InsertOne/ReplaceOne/DeleteOne._add_to_bulk)
+    def __init__(self):
+        self.runs = {"insert": [], "update": [], "delete": []}
+
+    def add_insert(self, doc):
+        self.runs["insert"].append(doc)
+
+    def add_replace(self, selector, replacement, upsert=False, **kwargs):
+        self.runs["update"].append((selector, replacement))
+
+    def add_delete(self, selector, limit, **kwargs):
+        self.runs["delete"].append(selector)
+
+class FakeCollection:
+    # Jeden shard: _id je unikátní; neuspořádaný bulk_write jako pymongo (inserty, update, delete)
+    name = "fake"
+
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: dict(doc, content_hash=content_hash(doc)) for doc in docs}
+
+    def _matches(self, doc, query):
+        for field, cond in query.items():
+            value = doc.get(field)
+            if isinstance(cond, dict):
+                if "$in" in cond and value not in cond["$in"]:
+                    return False
+                if "$gte" in cond and not (value is not None and value >= cond["$gte"]):
+                    return False
+                if "$lt" in cond and not (value is not None and value < cond["$lt"]):
+                    return False
+            elif value != cond:
+                return False
+        return True
+
+    def find(self, query, projection=None):
+        return [dict(doc) for doc in self.docs.values() if self._matches(doc, query)]
+
+    def bulk_write(self, ops, ordered=True):
+        assert not ordered
+        bulk = FakeBulk()
+        for op in ops:
+            op._add_to_bulk(bulk)
+        errors = []
+        for doc in bulk.runs["insert"]:
+            if doc["_id"] in self.docs:
+                errors.append({"code": 11000, "errmsg": f"E11000 duplicate key {doc['_id']}"})
+            else:
+                self.docs[doc["_id"]] = dict(doc)
+        for selector, replacement in bulk.runs["update"]:
+            for doc in self.find(selector):
+                self.docs[doc["_id"]] = dict(replacement)
+        for selector in bulk.runs["delete"]:
+            for doc in self.find(selector)[:1]:
+                del self.docs[doc["_id"]]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+def feature(_id, geohash, name):
+    return {"_id": _id, "type": "Feature", "geohash": geohash,
+            "geometry": {"type": "Point", "coordinates": [14.4, 50.0]}, "properties": {"name": name}}
+
+def test_geohash_change_without_index(tmp_path):
+    # Nový geohash na stejném shardu: starý dokument se musí smazat dřív, než se vloží nový
+    col = FakeCollection([feature("node/1", "u2fkb6gwg", "a"), feature("node/2", "u2fkb6gwh", "b")])
+    path = str(tmp_path / "accommodations.json")
+    write_features(path, iter([feature("node/1", "u2fm00000", "a"), feature("node/2", "u2fkb6gwh", "b")]), "json")
+
+    stats = sync_json_file(col, path)
+    assert stats["updated"] == 1 and stats["unchanged"] == 1 and stats["failed"] == 0
+    assert col.docs["node/1"]["geohash"] == "u2fm00000"
+
+def test_geohash_change_across_buckets(tmp_path):
+    old = [feature("node/1", "u2fkb6gwg", "a"), feature("node/2", "u2fm00000", "b"),
+           feature("node/3", "u2fq00000", "c"), feature("node/4", "u2fs00000", "d")]
+    new = [feature("node/1", "u2fs11111", "a"),  # přesun do pozdějšího rozsahu
+           feature("node/2", "u2fk00000", "b"),  # přesun do dřívějšího rozsahu
+           feature("node/3", "u2fq00000", "c2"),  # změna obsahu
+           feature("node/5", "u2fm11111", "e")]  # nová; node/4 zmizela
+    col = FakeCollection(old)
+    path = str(tmp_path / "accommodations.ndjson")
+    write_features(path, iter(new), "ndjson")
+    write_prefix_index(path, Counter(doc["geohash"][:4] for doc in new), 4)
+
+    stats = sync_json_file(col, path, bucket_docs=1)
+    assert stats["failed"] == 0
+    assert {_id: doc["geohash"] for _id, doc in col.docs.items()} == {doc["_id"]: doc["geohash"] for doc in new}
+    assert col.docs["node/3"]["properties"]["name"] == "c2"
@@ -0,0 +1,52 @@
+import os
+import sys
+import shapely
+from shapely.geometry import shape
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dataCleaner import compute_geohash
+from geohashCover import cover_cells, cells_to_ranges, polygon_ranges, within_polygon_query, \
+    circle_ranges, geohash_predicate, within_circle_query
+
+# Polygon tvaru C (zářez otevřený na východ) a prvek tvaru C uvnitř, jehož centroid leží v zářezu
+QUERY = {"type": "Polygon", "coordinates": [[
+    [14.0, 50.0], [14.1, 50.0], [14.1, 50.03], [14.03, 50.03], [14.03, 50.07],
+    [14.1, 50.07], [14.1, 50.1], [14.0, 50.1], [14.0, 50.0],
+]]}
+FEATURE = {"type": "Polygon", "coordinates": [[
+    [14.01, 50.01], [14.09, 50.01], [14.09, 50.02], [14.02, 50.02], [14.02, 50.08],
+    [14.09, 50.08], [14.09, 50.09], [14.01, 50.09], [14.01, 50.01],
+]]}
+MAX_CELLS = 512  # dost buněk, aby pokrytí samotného polygonu zářez vynechalo
+
+def in_ranges(geohash, ranges):
+    return any(geohash >= lo and (hi is None or geohash < hi) for lo, hi in ranges)
+
+def test_concave_feature_in_concave_polygon():
+    query, feature = shape(QUERY), shape(FEATURE)
+    geohash = compute_geohash(FEATURE)
+    assert query.contains(feature)
+    assert not query.contains(feature.centroid)
+
+    # pokrytí polygonu bez konvexního obalu dokument ztratí
+    shapely.prepare(query)
+    plain = cells_to_ranges(cover_cells(lambda b: query.intersects(shapely.box(*b)),
+                                        lambda b: query.contains(shapely.box(*b)), MAX_CELLS))
+    assert not in_ranges(geohash, plain)
+
+    for max_cells in (8, 24, MAX_CELLS):
+        assert in_ranges(geohash, polygon_ranges(QUERY, max_cells))
+
+def test_within_polygon_query_keeps_geo_operator():
+    query = within_polygon_query(QUERY)
+    geo, predicate = query["$and"]
+    assert geo == {"geometry": {"$geoWithin": {"$geometry": QUERY}}}
+    clauses = predicate.get("$or", [predicate])
+    assert all(set(clause) == {"geohash"} for clause in clauses)
+
+def test_empty_cover_matches_nothing():
+    assert circle_ranges(14.4378, 50.0755, -1) == []
+    assert polygon_ranges({"type": "Polygon", "coordinates": []}) == []
+    assert geohash_predicate([]) == {"geohash": {"$in": []}}
+    assert within_circle_query(14.4378, 50.0755, -1)["$and"][1] == {"geohash": {"$in": []}}